@@ -23,16 +23,19 @@ import : モニター設定JSONを読み込み、モニターをDatadog Organiza
 1. 実行時に **Datadog API Key** と **Application Key** を対話入力します
 2. `export`
    - 指定した CSV から Monitor ID を読み取り
-   - `GET /api/v1/monitor/{id}` でモニター定義を取得
+   - `GET /api/v1/monitor/{id}` でモニター定義を並列取得（最大 20 並列）
+     ※ID が 30 件を超える場合は `GET /api/v1/monitor` で全モニターを一括取得し、
+       一覧に含まれない ID のみ個別に取得します
    - `<id>.json` という名前で保存
 3. `import`
-   - 指定パターンに一致する JSON ファイルを逐次読み取り
-   - 各 JSON を `POST /api/v1/monitor` で新規モニターとして登録
+   - 指定パターンに一致する JSON ファイルを探索しながら順次キューへ投入し読み取り
+   - 各 JSON を `POST /api/v1/monitor` で新規モニターとして並列登録（最大 20 並列）
 4. 成功／失敗は `datadog_monitor.log`（INFO レベル以上）に記録されます
 
 前提条件
-- Python 3.8 以上
-- `datadog_api_client` ライブラリ（公式クライアント v1 系）を `pip3 install datadog-api-client` で導入済みであること
+- Python 3.9 以上
+- `aiohttp` / `orjson` ライブラリを `pip3 install aiohttp orjson` で導入済みであること
+- US-1 以外のサイトを利用する場合は環境変数 `DD_SITE`（例: datadoghq.eu）を設定すること
 - 実行環境から Datadog API エンドポイントへネットワーク到達できること
 
 Examples
@@ -45,17 +48,18 @@ $ python3 datadog_export_import_monitor.py import "*.json"
 
 from __future__ import annotations
 import argparse
+import asyncio
 import csv
 import glob
-import json
+import itertools
 import logging
 import os
 import sys
 from pathlib import Path
-from typing import Any, Dict, Final, Set
+from typing import Any, Dict, Final, Iterator, List, Set
 
-from datadog_api_client import ApiClient, Configuration
-from datadog_api_client.v1.api.monitors_api import MonitorsApi
+import aiohttp
+import orjson
 
 ################################################################################
 # Constants
@@ -72,6 +76,15 @@ from datadog_api_client.v1.api.monitors_api import MonitorsApi
 # * LOG_FILE / DATEFMT
 #   logging.basicConfig に渡す値をまとめています。
 #   ここを変更するだけでログ設定を一括で切り替え可能です。
+# * DD_SITE / API_BASE
+#   接続先の Datadog サイトです。環境変数 DD_SITE で上書きできます。
+# * CONCURRENCY / KEEPALIVE_TIMEOUT
+#   同時に実行する API リクエスト数の上限と、keep-alive 接続の保持秒数です。
+# * BULK_EXPORT_THRESHOLD / LIST_PAGE_SIZE
+#   export 対象がこの件数を超えると、ID ごとの GET ではなく
+#   一覧 API（1 ページ LIST_PAGE_SIZE 件）でまとめて取得します。
+# * IMPORT_QUEUE_SIZE
+#   import 時にファイル探索とアップロードの間に置くキューの最大長です。
 ################################################################################
 READ_ONLY_KEYS: Final[Set[str]] = {
     "id",
@@ -91,6 +104,17 @@ READ_ONLY_KEYS: Final[Set[str]] = {
 LOG_FILE: Final[str] = "datadog_monitor.log"
 DATEFMT: Final[str] = "%Y-%m-%d %H:%M:%S"
 
+DD_SITE: Final[str] = os.getenv("DD_SITE", "datadoghq.com")
+API_BASE: Final[str] = f"https://api.{DD_SITE}"
+
+CONCURRENCY: Final[int] = 20
+KEEPALIVE_TIMEOUT: Final[int] = 60
+
+BULK_EXPORT_THRESHOLD: Final[int] = 30
+LIST_PAGE_SIZE: Final[int] = 1000
+
+IMPORT_QUEUE_SIZE: Final[int] = 64
+
 # --- Python 標準 logging の初期化 -----------------------------------------
 logging.basicConfig(
     filename=LOG_FILE,
@@ -114,85 +138,152 @@ def get_api_keys() -> tuple[str, str]:
     return api_key.strip(), app_key.strip()
 
 
-def create_configuration(api_key: str, app_key: str) -> Configuration:
-    """Datadog API クライアント用の Configuration を生成。"""
-    cfg = Configuration()
-    cfg.api_key["apiKeyAuth"] = api_key
-    cfg.api_key["appKeyAuth"] = app_key
-    return cfg
+def create_session(api_key: str, app_key: str) -> aiohttp.ClientSession:
+    """認証ヘッダ付きの aiohttp.ClientSession を生成（接続は全リクエストで共有）。"""
+    headers = {
+        "DD-API-KEY": api_key,
+        "DD-APPLICATION-KEY": app_key,
+        "Content-Type": "application/json",
+    }
+    connector = aiohttp.TCPConnector(limit=CONCURRENCY, keepalive_timeout=KEEPALIVE_TIMEOUT)
+    return aiohttp.ClientSession(headers=headers, connector=connector, raise_for_status=True)
 
 
 def sanitize_monitor(payload: Dict[str, Any]) -> Dict[str, Any]:
-    """読み取り専用属性を除外して monitor 定義をクリーンアップする。"""
-    return {k: v for k, v in payload.items() if k not in READ_ONLY_KEYS}
+    """読み取り専用属性を除外して monitor 定義をクリーンアップする（payload を直接変更）。"""
+    for key in READ_ONLY_KEYS & payload.keys():
+        del payload[key]
+    return payload
 
 ################################################################################
 # Core actions
 ################################################################################
-# export / import の本体処理です。API 呼び出しは公式クライアントの
-# コンテキストマネージャを用い、セッション close 漏れを防いでいます。
+# export / import の本体処理です。API 呼び出しは 1 つの aiohttp セッションを
+# 共有し、Semaphore で同時実行数を CONCURRENCY に制限しながら並列に行います。
+# 個々の失敗は gather(return_exceptions=True) で回収し、まとめてログに記録します。
 ################################################################################
 
-def export_monitors(csv_file: str) -> None:
+async def _list_all_monitors(session: aiohttp.ClientSession) -> Dict[int, Dict[str, Any]]:
+    """一覧 API で Organization 内の全 monitor を取得し、ID をキーにした dict で返す。"""
+    monitors: Dict[int, Dict[str, Any]] = {}
+    page = 0
+    while True:
+        params = {"page": page, "page_size": LIST_PAGE_SIZE}
+        async with session.get(f"{API_BASE}/api/v1/monitor", params=params) as resp:
+            batch: List[Dict[str, Any]] = await resp.json()
+        for monitor in batch:
+            monitors[monitor["id"]] = monitor
+        if len(batch) < LIST_PAGE_SIZE:
+            return monitors
+        page += 1
+
+
+async def _export_one(
+    session: aiohttp.ClientSession,
+    sem: asyncio.Semaphore,
+    monitor_id: int,
+    prefetched: Dict[int, Dict[str, Any]],
+) -> None:
+    """monitor を 1 件取得し <id>.json に保存する（一括取得済みなら API は呼ばない）。"""
+    monitor = prefetched.get(monitor_id)
+    if monitor is None:
+        async with sem:
+            async with session.get(f"{API_BASE}/api/v1/monitor/{monitor_id}") as resp:
+                monitor = await resp.json()
+    data = sanitize_monitor(monitor)
+    out_path = Path(f"{monitor_id}.json")
+    content = orjson.dumps(data, default=str, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    await asyncio.to_thread(out_path.write_bytes, content)
+    logging.info("Exported monitor ID %s", monitor_id)
+
+
+async def _import_one(session: aiohttp.ClientSession, file_path: str) -> None:
+    """JSON ファイル 1 件を読み込み monitor を新規作成する。"""
+    content = await asyncio.to_thread(Path(file_path).read_bytes)
+    payload: Dict[str, Any] = orjson.loads(content)
+    body = sanitize_monitor(payload)
+    async with session.post(f"{API_BASE}/api/v1/monitor", json=body) as resp:
+        monitor: Dict[str, Any] = await resp.json()
+    logging.info("Imported %s as new monitor ID %s", file_path, monitor.get("id"))
+
+
+async def _produce_paths(queue: asyncio.Queue, files: Iterator[str]) -> None:
+    """探索したファイルパスをキューへ投入し、最後に worker 数分の終了通知を送る。"""
+    try:
+        for file_path in files:
+            await queue.put(file_path)
+    finally:
+        for _ in range(CONCURRENCY):
+            await queue.put(None)
+
+
+async def _import_worker(session: aiohttp.ClientSession, queue: asyncio.Queue) -> None:
+    """キューからファイルパスを取り出して import する（None で終了）。"""
+    while (file_path := await queue.get()) is not None:
+        try:
+            await _import_one(session, file_path)
+        except Exception as exc:
+            msg = f"Failed to import {file_path}: {exc}"
+            logging.error(msg)
+            print(msg, file=sys.stderr)
+
+
+async def export_monitors(csv_file: str) -> None:
     """CSV で指定された monitor を Datadog から取得し JSON で保存。"""
+    monitor_ids: List[int] = []
+    with open(csv_file, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header or header[0].lower() != "id":
+            print("CSV first column header must be 'id'", file=sys.stderr)
+            return
+        for row in reader:
+            if not row:
+                continue
+            try:
+                monitor_ids.append(int(row[0]))
+            except ValueError:
+                msg = f"Invalid ID '{row[0]}' – skipping"
+                logging.error(msg)
+                print(msg, file=sys.stderr)
+
     api_key, app_key = get_api_keys()
-    configuration = create_configuration(api_key, app_key)
-
-    with ApiClient(configuration) as api_client:
-        api = MonitorsApi(api_client)
-        with open(csv_file, newline="", encoding="utf-8") as f:
-            reader = csv.reader(f)
-            header = next(reader, None)
-            if not header or header[0].lower() != "id":
-                print("CSV first column header must be 'id'", file=sys.stderr)
-                return
-            for row in reader:
-                if not row:
-                    continue
-                try:
-                    monitor_id = int(row[0])
-                except ValueError:
-                    msg = f"Invalid ID '{row[0]}' – skipping"
-                    logging.error(msg)
-                    print(msg, file=sys.stderr)
-                    continue
-                try:
-                    monitor = api.get_monitor(monitor_id)
-                    data = sanitize_monitor(monitor.to_dict())
-                    out_path = Path(f"{monitor_id}.json")
-                    with out_path.open("w", encoding="utf-8") as jf:
-                        json.dump(data, jf, indent=4, ensure_ascii=False, default=str)
-                    logging.info("Exported monitor ID %s", monitor_id)
-                except Exception as exc:
-                    msg = f"Failed to export monitor ID {monitor_id}: {exc}"
-                    logging.error(msg)
-                    print(msg, file=sys.stderr)
-
-
-def import_monitors(pattern: str) -> None:
+    sem = asyncio.Semaphore(CONCURRENCY)
+
+    async with create_session(api_key, app_key) as session:
+        prefetched: Dict[int, Dict[str, Any]] = {}
+        if len(monitor_ids) > BULK_EXPORT_THRESHOLD:
+            try:
+                prefetched = await _list_all_monitors(session)
+            except Exception as exc:
+                msg = f"Failed to list monitors, falling back to per-ID export: {exc}"
+                logging.warning(msg)
+                print(msg, file=sys.stderr)
+        tasks = [_export_one(session, sem, monitor_id, prefetched) for monitor_id in monitor_ids]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    for monitor_id, result in zip(monitor_ids, results):
+        if isinstance(result, Exception):
+            msg = f"Failed to export monitor ID {monitor_id}: {result}"
+            logging.error(msg)
+            print(msg, file=sys.stderr)
+
+
+async def import_monitors(pattern: str) -> None:
     """パターンにマッチする JSON ファイルから monitor を新規作成。"""
-    files = glob.glob(pattern)
-    if not files:
+    files = glob.iglob(pattern)
+    first = next(files, None)
+    if first is None:
         print(f"No JSON files found for pattern: {pattern}", file=sys.stderr)
         logging.error("No JSON files found for pattern: %s", pattern)
         return
 
     api_key, app_key = get_api_keys()
-    configuration = create_configuration(api_key, app_key)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=IMPORT_QUEUE_SIZE)
 
-    with ApiClient(configuration) as api_client:
-        api = MonitorsApi(api_client)
-        for file_path in files:
-            try:
-                with open(file_path, encoding="utf-8") as f:
-                    payload: Dict[str, Any] = json.load(f)
-                body = sanitize_monitor(payload)
-                monitor = api.create_monitor(body=body)
-                logging.info("Imported %s as new monitor ID %s", file_path, monitor.id)
-            except Exception as exc:
-                msg = f"Failed to import {file_path}: {exc}"
-                logging.error(msg)
-                print(msg, file=sys.stderr)
+    async with create_session(api_key, app_key) as session:
+        workers = [_import_worker(session, queue) for _ in range(CONCURRENCY)]
+        await asyncio.gather(_produce_paths(queue, itertools.chain([first], files)), *workers)
 
 ################################################################################
 # CLI
@@ -217,9 +308,9 @@ def parse_args() -> argparse.Namespace:
 def main() -> None:
     args = parse_args()
     if args.command == "export":
-        export_monitors(args.csv_file)
+        asyncio.run(export_monitors(args.csv_file))
     elif args.command == "import":
-        import_monitors(args.pattern)
+        asyncio.run(import_monitors(args.pattern))
 
 
 if __name__ == "__main__":
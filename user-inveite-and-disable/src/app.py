@@ -12,12 +12,13 @@ S3 に `create_user.csv` / `delete_user.csv` を置くと自動実行されま
 from __future__ import annotations
 
 import csv
+import io
 import json
 import logging
 import os
+import threading
 import urllib.parse
-from collections import defaultdict
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple
 
 import boto3
 import urllib3
@@ -54,11 +55,24 @@ s3 = boto3.client("s3")
 # Datadog サイト（US-1）
 DD_SITE = "api.datadoghq.com"
 
+# Datadog API 用 HTTP コネクションプール（ウォームスタート間で TLS 接続を再利用）
+HTTP = urllib3.PoolManager(num_pools=8, maxsize=16, block=False)
+
+# メールアドレス検索時の 1 ページ件数（filter は部分一致のため完全一致を後段で判定）
+USER_SEARCH_PAGE_SIZE = 100
+
+# ロール一覧取得時の 1 ページ件数
+ROLE_PAGE_SIZE = 100
+
+# org → {ロール名（小文字）: role_id} のキャッシュ（ウォームスタート間で保持）
+_ROLE_CACHE: Dict[str, Dict[str, str]] = {}
+_ROLE_CACHE_LOCK = threading.Lock()
+
 # ────────────────────────────────────────────────────────────────
-# Datadog ユーザ作成 + 招待メール送信
+# Datadog API クライアント生成
 # ────────────────────────────────────────────────────────────────
-def create_and_invite_user(keys: Tuple[str, str], name: str, email: str, role_id: str) -> None:
-    """ユーザを作成し、招待メールを即時送信する。"""
+def _create_api_client(keys: Tuple[str, str]) -> ApiClient:
+    """Org の API/App Key から ApiClient を生成する（1 Org につき 1 つを使い回す）。"""
     api_key, app_key = keys
     configuration = Configuration(
         host=f"https://{DD_SITE}",
@@ -67,6 +81,23 @@ def create_and_invite_user(keys: Tuple[str, str], name: str, email: str, role_id
             "appKeyAuth": app_key,
         },
     )
+    return ApiClient(configuration)
+
+
+def _dd_headers(keys: Tuple[str, str]) -> Dict[str, str]:
+    """urllib3 で Datadog API を直接呼ぶ際の認証ヘッダを返す。"""
+    api_key, app_key = keys
+    return {
+        "DD-API-KEY": api_key,
+        "DD-APPLICATION-KEY": app_key,
+        "Content-Type": "application/json",
+    }
+
+# ────────────────────────────────────────────────────────────────
+# Datadog ユーザ作成 + 招待メール送信
+# ────────────────────────────────────────────────────────────────
+def create_and_invite_user(users_api: UsersApi, name: str, email: str, role_id: str) -> None:
+    """ユーザを作成し、招待メールを即時送信する。"""
     #1) ユーザ作成
     body = UserCreateRequest(
         data=UserCreateData(
@@ -79,82 +110,109 @@ def create_and_invite_user(keys: Tuple[str, str], name: str, email: str, role_id
             ),
         )
     )
-    with ApiClient(configuration) as api_client:
-        users_api = UsersApi(api_client)
-        try:
-            create_resp = users_api.create_user(body=body)
-            user_id = create_resp.data.id
-            LOGGER.info("[CreateUser] %s → status=%s", email, create_resp.data.attributes.status)
-        except Exception:
-            LOGGER.exception("Failed to create Datadog user: %s", email)
-            raise
-        #2) 招待メール送信
-        invite_body = UserInvitationsRequest(
-            data=[
-                UserInvitationData(
-                    type=UserInvitationsType.USER_INVITATIONS,
-                    relationships=UserInvitationRelationships(
-                        user=RelationshipToUser(
-                            data=RelationshipToUserData(type=UsersType.USERS, id=user_id)
-                        )
-                    ),
-                )
-            ]
-        )
-        try:
-            invite_resp = users_api.send_invitations(body=invite_body)
-            LOGGER.info("[SendInvite] %s → invitations sent", email)
-        except Exception:
-            LOGGER.exception("Failed to send invitation to: %s", email)
-            raise
+    try:
+        create_resp = users_api.create_user(body=body)
+        user_id = create_resp.data.id
+        LOGGER.info("[CreateUser] %s → status=%s", email, create_resp.data.attributes.status)
+    except Exception:
+        LOGGER.exception("Failed to create Datadog user: %s", email)
+        raise
+    #2) 招待メール送信
+    invite_body = UserInvitationsRequest(
+        data=[
+            UserInvitationData(
+                type=UserInvitationsType.USER_INVITATIONS,
+                relationships=UserInvitationRelationships(
+                    user=RelationshipToUser(
+                        data=RelationshipToUserData(type=UsersType.USERS, id=user_id)
+                    )
+                ),
+            )
+        ]
+    )
+    try:
+        invite_resp = users_api.send_invitations(body=invite_body)
+        LOGGER.info("[SendInvite] %s → invitations sent", email)
+    except Exception:
+        LOGGER.exception("Failed to send invitation to: %s", email)
+        raise
 
 # ────────────────────────────────────────────────────────────────
 # Datadog ユーザ削除処理
 # ────────────────────────────────────────────────────────────────
-def delete_user(keys: Tuple[str, str], email: str) -> None:
+def _find_user_ids(keys: Tuple[str, str], email: str) -> List[str]:
+    """メールアドレスが完全一致するユーザ ID をサーバ側フィルタで検索する。"""
+    url = f"https://{DD_SITE}/api/v2/users"
+    fields = {"filter": email, "page[size]": str(USER_SEARCH_PAGE_SIZE)}
+    resp = HTTP.request("GET", url, fields=fields, headers=_dd_headers(keys))
+    if resp.status >= 300:
+        raise RuntimeError(f"Failed to search users (status {resp.status})")
+    return [
+        user["id"]
+        for user in json.loads(resp.data)["data"]
+        if (user["attributes"].get("email") or "").lower() == email.lower()
+    ]
+
+
+def delete_user(keys: Tuple[str, str], users_api: UsersApi, email: str) -> None:
     """指定したメールアドレスのユーザを Datadog から削除（disable）する。"""
-    api_key, app_key = keys
-    configuration = Configuration(
-        host=f"https://{DD_SITE}",
-        api_key={
-            "apiKeyAuth": api_key,
-            "appKeyAuth": app_key,
-        },
-    )
-    with ApiClient(configuration) as api_client:
-        users_api = UsersApi(api_client)
-        try:
-            # ユーザ一覧から対象ユーザを検索
-            users = list(users_api.list_users_with_pagination())
-            user = next((u for u in users if u.attributes.email.lower() == email.lower()), None)
-            if not user:
-                LOGGER.warning("User not found for deletion: %s", email)
-                return
-            users_api.disable_user(user_id=user.id)
-            LOGGER.info("[DeleteUser] %s → disabled", email)
-        except Exception:
-            LOGGER.exception("Failed to delete user: %s", email)
-            raise
+    try:
+        # メールアドレスで対象ユーザを検索
+        user_ids = _find_user_ids(keys, email)
+        if not user_ids:
+            LOGGER.warning("User not found for deletion: %s", email)
+            return
+        if len(user_ids) > 1:
+            LOGGER.error("Multiple users matched for deletion, skipping: %s", email)
+            return
+        users_api.disable_user(user_id=user_ids[0])
+        LOGGER.info("[DeleteUser] %s → disabled", email)
+    except Exception:
+        LOGGER.exception("Failed to delete user: %s", email)
+        raise
 
 # ────────────────────────────────────────────────────────────────
 # Utility: Datadog Role ID 解決
 # ────────────────────────────────────────────────────────────────
-def _get_role_id(keys: Tuple[str, str], role_name: str) -> str:
-    api_key, app_key = keys
-    headers = {
-        "DD-API-KEY": api_key,
-        "DD-APPLICATION-KEY": app_key,
-        "Content-Type": "application/json",
-    }
-    http = urllib3.PoolManager()
+def _fetch_roles(keys: Tuple[str, str]) -> Dict[str, str]:
+    """Org の全ロールを取得し {ロール名（小文字）: role_id} を返す。"""
     url = f"https://{DD_SITE}/api/v2/roles"
-    resp = http.request("GET", url, headers=headers)
-    if resp.status >= 300:
-        raise RuntimeError(f"Failed to list roles (status {resp.status})")
-    for role in json.loads(resp.data.decode())["data"]:
-        if role["attributes"]["name"].lower() == role_name.lower():
-            return role["id"]
-    raise KeyError(f"Role '{role_name}' not found")
+    roles: Dict[str, str] = {}
+    page_number = 0
+    while True:
+        fields = {"page[size]": str(ROLE_PAGE_SIZE), "page[number]": str(page_number)}
+        resp = HTTP.request("GET", url, fields=fields, headers=_dd_headers(keys))
+        if resp.status >= 300:
+            raise RuntimeError(f"Failed to list roles (status {resp.status})")
+        data = json.loads(resp.data)["data"]
+        for role in data:
+            roles[role["attributes"]["name"].lower()] = role["id"]
+        if len(data) < ROLE_PAGE_SIZE:
+            return roles
+        page_number += 1
+
+
+def _get_role_id(org_name: str, keys: Tuple[str, str], role_name: str) -> str:
+    """Role ID を返す。Org ごとのロール一覧はウォームコンテナ内で 1 度だけ取得する。"""
+    role_key = role_name.lower()
+    with _ROLE_CACHE_LOCK:
+        roles = _ROLE_CACHE.get(org_name)
+        if roles is None or role_key not in roles:
+            # 未取得、またはキャッシュ後にロールが追加された可能性があるため 1 度だけ再取得
+            roles = _ROLE_CACHE[org_name] = _fetch_roles(keys)
+    try:
+        return roles[role_key]
+    except KeyError:
+        raise KeyError(f"Role '{role_name}' not found") from None
+
+# ────────────────────────────────────────────────────────────────
+# Utility: 処理済み CSV の削除
+# ────────────────────────────────────────────────────────────────
+def _delete_processed_csv(bucket: str, key: str) -> None:
+    try:
+        s3.delete_object(Bucket=bucket, Key=key)
+    except Exception:
+        LOGGER.exception("Failed to delete processed CSV: %s", key)
 
 # ────────────────────────────────────────────────────────────────
 # Lambda ハンドラ
@@ -176,66 +234,89 @@ def lambda_handler(event, context):
     # Secrets Manager からDatadog Orgごとの API/App Key を取得
     secret_name = os.environ["SECRET_NAME"]
     secret_json = json.loads(secrets.get_secret_value(SecretId=secret_name)["SecretString"])
+    # Org 名は大文字小文字を区別せずに照合できるよう casefold したものをキーにする
     org_map: Dict[str, Tuple[str, str]] = {
-        org: (data["keys"]["apiKey"], data["keys"]["appKey"]) for org, data in secret_json["orgs"].items()
+        org.casefold(): (data["keys"]["apiKey"], data["keys"]["appKey"]) for org, data in secret_json["orgs"].items()
     }
 
-    role_cache: Dict[Tuple[str, str], str] = defaultdict(str)
-
-    # S3上のファイルごとに処理
-    for record in records:
-        bucket = record["s3"]["bucket"]["name"]
-        key = urllib.parse.unquote_plus(record["s3"]["object"]["key"])
-        mode = "create" if key.endswith("create_user.csv") else "delete" if key.endswith("delete_user.csv") else None
-        if not mode:
-            continue
-
-        # CSVファイルを読み取り
-        csv_rows = csv.DictReader(s3.get_object(Bucket=bucket, Key=key)["Body"].read().decode("utf-8").splitlines())
-        for row in csv_rows:
+    # Org ごとの ApiClient を 1 度だけ生成し、全行で接続を使い回す
+    api_clients: Dict[str, ApiClient] = {org: _create_api_client(keys) for org, keys in org_map.items()}
+    users_apis: Dict[str, UsersApi] = {org: UsersApi(client) for org, client in api_clients.items()}
 
-            # メールアドレスのバリデーション
-            email = row.get("email", "").strip()
-            if not email:
-                LOGGER.error("[CSV] Missing email column: %s", row)
+    try:
+        # S3上のファイルごとに処理
+        for record in records:
+            key = urllib.parse.unquote_plus(record["s3"]["object"]["key"])
+            mode = "create" if key.endswith("create_user.csv") else "delete" if key.endswith("delete_user.csv") else None
+            if not mode:
                 continue
-            if mode == "create":
-                name = (row.get("name") or "").strip() or email
-
-            # 組織とロール名の取得
-            org_name = row.get("org", "").strip()
-            role_name = row.get("role", "").strip()
-            if not org_name or not role_name:
-                LOGGER.error("[CSV] Missing org/role: %s", row)
-                continue
-            if org_name not in org_map:
-                LOGGER.error("Unknown org: %s", org_name)
+            bucket = record["s3"]["bucket"]["name"]
+
+            # 空ファイルはダウンロードせずに削除（サイズは S3 イベントに含まれる）
+            if record["s3"]["object"].get("size") == 0:
+                LOGGER.warning("[CSV] Empty file, skipping: %s", key)
+                _delete_processed_csv(bucket, key)
                 continue
-            keys = org_map[org_name]
-            cache_key = (org_name, role_name)
-            if not role_cache[cache_key]:
-                # Role ID が未キャッシュなら API で取得
+
+            # CSVファイルをストリームで 1 行ずつ読み取り（ファイル全体をメモリに載せない）
+            body = s3.get_object(Bucket=bucket, Key=key)["Body"]
+            csv_rows = csv.reader(io.TextIOWrapper(body, encoding="utf-8", newline=""))
+
+            # ヘッダ行から列番号を 1 度だけ解決（存在しない列は -1 = 末尾の空セルを参照）
+            header = [c.strip() for c in next(csv_rows, [])]
+            col_idx = {column: i for i, column in enumerate(header)}
+            email_idx = col_idx.get("email", -1)
+            name_idx = col_idx.get("name", -1)
+            org_idx = col_idx.get("org", -1)
+            role_idx = col_idx.get("role", -1)
+
+            for raw_row in csv_rows:
+                if not raw_row:
+                    continue
+                row = [c.strip() for c in raw_row]
+                row.extend([""] * (len(header) - len(row)))
+                row.append("")
+
+                # メールアドレスのバリデーション
+                email = row[email_idx]
+                if not email:
+                    LOGGER.error("[CSV] Missing email column: %s", raw_row)
+                    continue
+                if mode == "create":
+                    name = row[name_idx] or email
+
+                # 組織とロール名の取得
+                org_name = row[org_idx]
+                role_name = row[role_idx]
+                if not org_name or not role_name:
+                    LOGGER.error("[CSV] Missing org/role: %s", raw_row)
+                    continue
+                org_key = org_name.casefold()
+                keys = org_map.get(org_key)
+                if keys is None:
+                    LOGGER.error("Unknown org: %s", org_name)
+                    continue
+                # Role ID を解決（未キャッシュの Org のみ API で取得）
                 try:
-                    role_cache[cache_key] = _get_role_id(keys, role_name)
+                    role_id = _get_role_id(org_key, keys, role_name)
                 except Exception:
                     LOGGER.exception("Role lookup failed → %s / %s", org_name, role_name)
                     continue
-            role_id = role_cache[cache_key]
-            if mode == "create":
-                try:
-                    # Datadog にユーザ作成＆招待メール送信
-                    create_and_invite_user(keys, name, email, role_id)
-                except Exception:
-                    LOGGER.exception("[Create+Invite] failed: %s", email)
-            elif mode == "delete":
-                try:
-                    # Datadog からユーザ削除（disable）
-                    delete_user(keys, email)
-                except Exception:
-                    LOGGER.exception("[DeleteUser] failed: %s", email)
+                if mode == "create":
+                    try:
+                        # Datadog にユーザ作成＆招待メール送信
+                        create_and_invite_user(users_apis[org_key], name, email, role_id)
+                    except Exception:
+                        LOGGER.exception("[Create+Invite] failed: %s", email)
+                elif mode == "delete":
+                    try:
+                        # Datadog からユーザ削除（disable）
+                        delete_user(keys, users_apis[org_key], email)
+                    except Exception:
+                        LOGGER.exception("[DeleteUser] failed: %s", email)
 
-        # 処理済み CSV を削除
-        try:
-            s3.delete_object(Bucket=bucket, Key=key)
-        except Exception:
-            LOGGER.exception("Failed to delete processed CSV: %s", key)
+            # 処理済み CSV を削除
+            _delete_processed_csv(bucket, key)
+    finally:
+        for api_client in api_clients.values():
+            api_client.close()
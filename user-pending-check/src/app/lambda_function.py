@@ -8,13 +8,16 @@ Secrets Manager に保存された Datadog 組織ごとの API / Application Key
 反映結果を JSON回答する Lambda 関数です。
 """
 
+import asyncio
 import json
+import math
 import os
 import logging
-from typing import Dict, List, Generator
+from typing import Dict, List
 
+import aiohttp
 import boto3
-import requests
+import orjson
 
 # --------------------------------------------------
 # ログ設定
@@ -31,6 +34,16 @@ SECRET_NAME: str = os.environ.get("SECRET_NAME", "ddOrgSecret")
 DATADOG_SITE: str = os.environ.get("DATADOG_SITE", "datadoghq.com")
 # Datadog API v2 の 1 ページ得点数
 PAGE_SIZE: int = 100
+# 1 リクエストあたりのタイムアウト (秒)
+REQUEST_TIMEOUT: int = 10
+# 全組織で共有する HTTP コネクション数の上限
+MAX_CONNECTIONS: int = 10
+# 同時に発行する API リクエスト数の上限
+MAX_CONCURRENT_REQUESTS: int = 8
+# 一時的なエラー (429 / 5xx) の再試行回数・バックオフ係数・対象ステータス
+MAX_RETRIES: int = 3
+BACKOFF_FACTOR: float = 0.3
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
 
 
 # --------------------------------------------------
@@ -45,68 +58,106 @@ def get_orgs() -> Dict[str, dict]:
 
 
 # --------------------------------------------------
-# Datadog API v2 /users エンドポイントのページングを透過的に処理するジェネレータ
+# Datadog API v2 /users エンドポイントのページ取得
 # --------------------------------------------------
 
-def list_users(api_key: str, app_key: str) -> Generator[dict, None, None]:
-    """ユーザ情報を取得するジェネレータ"""
+async def get_users_page(
+    session: aiohttp.ClientSession,
+    sem: asyncio.Semaphore,
+    headers: Dict[str, str],
+    page_number: int,
+) -> dict:
+    """指定ページの招待保留ユーザを取得し、レスポンス JSON を返す"""
+    url: str = f"https://api.{DATADOG_SITE}/api/v2/users"
+    params = {
+        "page[number]": page_number,
+        "page[size]": PAGE_SIZE,
+        "filter[status]": "Pending",
+    }
+    for attempt in range(MAX_RETRIES + 1):
+        async with sem:
+            try:
+                async with session.get(url, headers=headers, params=params) as res:
+                    if res.status not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                        if res.status >= 400:
+                            logger.error("Response content: %s", await res.text())
+                        res.raise_for_status()
+                        return orjson.loads(await res.read())
+                    logger.warning(
+                        "Datadog API returned %s, retrying (%d/%d)",
+                        res.status, attempt + 1, MAX_RETRIES,
+                    )
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.error("Datadog API request failed: %s", e)
+                raise
+        # --- セマフォを解放してから指数バックオフで待機 ---
+        await asyncio.sleep(BACKOFF_FACTOR * (2 ** attempt))
+    raise RuntimeError("unreachable")
+
+
+async def list_users(
+    session: aiohttp.ClientSession,
+    sem: asyncio.Semaphore,
+    api_key: str,
+    app_key: str,
+) -> List[dict]:
+    """ユーザ情報を取得する (2 ページ目以降は総件数から算出して並列取得)"""
     headers = {
         "DD-API-KEY": api_key,
         "DD-APPLICATION-KEY": app_key,
         "Content-Type": "application/json",
     }
-    # 初回リクエスト URL
-    url: str = f"https://api.{DATADOG_SITE}/api/v2/users"
-    params = {"page[size]": PAGE_SIZE, "filter[status]": "Pending"}
-
-    while url:
-        # --- API 呼び出し ---
-        try:
-            res = requests.get(
-                url,
-                headers=headers,
-                params=params,
-                timeout=10          # タイムアウトを明示
-            )
-            res.raise_for_status()
-        except requests.RequestException as e:
-            logger.error("Datadog API request failed: %s", e)
-            logger.error("Response content: %s",
-                        getattr(e.response, "text", "N/A"))
-            raise
-
-        body = res.json()
-        # --- 現在ページの data を yield ---
-        yield from body.get("data", [])
-
-        # --- 次ページ URL があれば継続し、なければループ終了 ---
-        url = body.get("links", {}).get("next")
-        params = None  # 次ページ以降は URL にパラメータが内包される
+    # --- 初回リクエストで総件数を取得 ---
+    first = await get_users_page(session, sem, headers, 0)
+    users: List[dict] = list(first.get("data", []))
+
+    page_meta = first.get("meta", {}).get("page", {})
+    total = page_meta.get("total_filtered_count", page_meta.get("total_count", 0))
+    pages = math.ceil(total / PAGE_SIZE)
+
+    # --- 残りのページ (page[number] は 0 始まり) をまとめて取得 ---
+    bodies = await asyncio.gather(
+        *(get_users_page(session, sem, headers, n) for n in range(1, pages))
+    )
+    for body in bodies:
+        users.extend(body.get("data", []))
+    return users
 
 
 # --------------------------------------------------
 # 各組織で invite_pending 状態のユーザを抽出
 # --------------------------------------------------
 
-def fetch_invite_pending(org_name: str, keys: dict) -> List[dict]:
+async def fetch_invite_pending(
+    session: aiohttp.ClientSession,
+    sem: asyncio.Semaphore,
+    org_name: str,
+    keys: dict,
+) -> List[dict]:
     """招待保留状態 (invite_pending) のユーザ一覧を返す"""
     api, app = keys["apiKey"], keys["appKey"]
-    pending: List[dict] = []
-
-    # 全ユーザを走査
-    for user in list_users(api, app):
-        status = user.get("attributes", {}).get("status", "").lower()
-        # Datadog API の値は Pending/Active/Disabled
-        if status == "pending":
-            # 必要最小限の属性のみ保持
-            pending.append(
-                {
-                    "id": user["id"],
-                    "email": user["attributes"].get("email"),
-                    "name": user["attributes"].get("name"),
-                }
-            )
-    return pending
+
+    # filter[status]=Pending でサーバ側が絞り込み済みのため、必要最小限の属性のみ保持
+    return [
+        {
+            "id": user["id"],
+            "email": user["attributes"].get("email"),
+            "name": user["attributes"].get("name"),
+        }
+        for user in await list_users(session, sem, api, app)
+    ]
+
+
+async def fetch_all_orgs(orgs: Dict[str, dict]) -> Dict[str, List[dict]]:
+    """全組織の招待保留ユーザを 1 つのセッションで並列取得する"""
+    sem = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)  # タイムアウトを明示
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        results = await asyncio.gather(
+            *(fetch_invite_pending(session, sem, org_name, info["keys"]) for org_name, info in orgs.items())
+        )
+    return dict(zip(orgs, results))
 
 
 # --------------------------------------------------
@@ -115,26 +166,16 @@ def fetch_invite_pending(org_name: str, keys: dict) -> List[dict]:
 
 def lambda_handler(event, context):
     """全組織の invite_pending ユーザを集計し、ログ + レスポンス返却"""
-    result: Dict[str, List[dict]] = {}
-
-    # --- Secrets Manager で定義されたすべての組織をループ ---
-    for org_name, info in get_orgs().items():
-        result[org_name] = fetch_invite_pending(org_name, info["keys"])
+    # --- Secrets Manager で定義されたすべての組織を並列に処理 ---
+    result: Dict[str, List[dict]] = asyncio.run(fetch_all_orgs(get_orgs()))
 
-    # --- CloudWatch Logs へ整形出力 ---
-    print("Invite Pending Users")
+    # --- CloudWatch Logs へ組織ごとに 1 レコードの構造化ログで出力 ---
     for org, users in result.items():
-        print(f"=== {org} ===")
-        if not users:
-            print("招待保留ユーザはありません")
-        else:
-            for u in users:
-                # 左詰め整形: email 35文字・名前25文字・ID
-                print(f"{u['email']:<35} {u['name'] or '-':<25} id:{u['id']}")
+        logger.info("%s", orjson.dumps({"org": org, "pending": users}).decode())
 
     # --- API Gateway などへのレスポンス ---
     return {
         "statusCode": 200,
-        # ensure_ascii=False で日本語もそのまま出力
-        "body": json.dumps(result, ensure_ascii=False),
+        # orjson は UTF-8 で出力するため日本語もそのまま出力
+        "body": orjson.dumps(result).decode(),
     }